@@ -5,12 +5,52 @@ Utility functions for the Fast Monitor Agent.
 """
 
 import logging
+import fnmatch
 import hashlib
+import os
 import random
 import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set, Tuple
+from urllib.parse import quote
+
+
+# Read size for checksum calculation, in line with typical readahead windows
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+# Checksum algorithm stored in swf-monitor unless configured otherwise
+DEFAULT_CHECKSUM_ALGORITHM = "md5"
+
+# Threads used to checksum a batch of STF files unless configured otherwise
+DEFAULT_CHECKSUM_WORKERS = 4
+
+# Concurrent TF record POSTs per STF unless configured otherwise (1 = sequential)
+DEFAULT_TF_RECORD_WORKERS = 1
+
+
+# Maximum number of STF filenames remembered as recorded between scan cycles
+RECORDED_CACHE_SIZE = 100_000
+
+
+# Directory mtimes this close to the current time are not trusted for skipping unchanged directories:
+# on filesystems with coarse timestamps (NFS, HFS+, FAT) a file added in the same tick leaves the mtime as is
+RACY_MTIME_WINDOW_NS = 2_000_000_000
+
+
+# Run number patterns, tried in order of precedence
+RUN_NUMBER_PATTERNS = tuple(
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r"run_(\d+)",
+        r"run(\d+)",
+        r"r(\d+)",
+    )
+)
 
 
 # File status constants (matching Django FileStatus choices)
@@ -35,45 +75,153 @@ def validate_config(config: dict) -> None:
     if not (0.0 <= config["selection_fraction"] <= 1.0):
         raise ValueError("selection_fraction must be between 0.0 and 1.0")
 
+    algorithm = config.get("checksum_algorithm", DEFAULT_CHECKSUM_ALGORITHM)
+    if algorithm not in hashlib.algorithms_available:
+        raise ValueError(f"Unsupported checksum_algorithm: {algorithm}")
+    # Variable-length digests (shake_128, shake_256) need a length for hexdigest()
+    if hashlib.new(algorithm, usedforsecurity=False).digest_size == 0:
+        raise ValueError(f"checksum_algorithm must have a fixed-length digest: {algorithm}")
+
+    for key, default in (("checksum_workers", DEFAULT_CHECKSUM_WORKERS),
+                         ("tf_record_workers", DEFAULT_TF_RECORD_WORKERS)):
+        workers = config.get(key, default)
+        if isinstance(workers, bool) or not isinstance(workers, int) or workers < 1:
+            raise ValueError(f"{key} must be a positive integer")
 
-def find_recent_files(config: dict, logger: logging.Logger) -> List[Path]:
+
+def compile_file_patterns(file_patterns: List[str]) -> re.Pattern:
+    """
+    Combine shell-style file patterns into a single compiled regular expression.
+    Matching is case-insensitive, so case variants such as "*.stf" and "*.STF"
+    collapse into one alternative. The result is cached, so repeated scans with
+    the same patterns do not recompile.
+
+    Args:
+        file_patterns: List of glob patterns, e.g. ["*.stf", "*.STF"]
+
+    Returns:
+        Compiled pattern matching a file name against any of the patterns
+    """
+    return _compile_file_patterns(tuple(file_patterns))
+
+
+@lru_cache(maxsize=32)
+def _compile_file_patterns(file_patterns: tuple) -> re.Pattern:
+    unique_patterns = dict.fromkeys(pattern.lower() for pattern in file_patterns)
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in unique_patterns), re.IGNORECASE)
+
+
+def find_recent_files(config: dict, logger: logging.Logger,
+                      file_stats: Optional[Dict[Path, os.stat_result]] = None,
+                      dir_mtimes: Optional[Dict[str, int]] = None,
+                      scanned_dirs: Optional[Dict[str, Tuple[int, List[str]]]] = None) -> List[Path]:
     """
     Find files in the watch directories, created within the lookback time period.
 
     Args:
         config: Configuration dictionary
         logger: Logger instance
+        file_stats: Optional dictionary filled with the stat result of each returned file,
+            so later steps do not need to stat the files again
+        dir_mtimes: Optional modification times of already processed directories, see iter_recent_files
+        scanned_dirs: Optional dictionary filled with the scanned directories, see iter_recent_files
 
     Returns:
         List of Path objects for matching files
     """
+    return list(iter_recent_files(config, logger, file_stats, dir_mtimes, scanned_dirs))
+
+
+def iter_recent_files(config: dict, logger: logging.Logger,
+                      file_stats: Optional[Dict[Path, os.stat_result]] = None,
+                      dir_mtimes: Optional[Dict[str, int]] = None,
+                      scanned_dirs: Optional[Dict[str, Tuple[int, List[str]]]] = None) -> Iterator[Path]:
+    """
+    Lazily yield files in the watch directories, created within the lookback time period.
+    Files are yielded while the directories are scanned, so consumers can stop early
+    without materializing the full listing.
+
+    Args:
+        config: Configuration dictionary
+        logger: Logger instance
+        file_stats: Optional dictionary filled with the stat result of each yielded file
+        dir_mtimes: Optional modification times (ns) of directories whose files were all
+            processed, keyed by directory. Directories whose mtime still matches are skipped,
+            as no file was added to or removed from them. See mark_directories_processed.
+        scanned_dirs: Optional dictionary filled with the mtime (ns) and matching filenames of
+            each fully scanned directory. Directories modified within RACY_MTIME_WINDOW_NS of
+            the scan are left out, so they are always scanned again.
+
+    Yields:
+        Path objects for matching files
+    """
     cutoff_timestamp = None
     if config["lookback_time"]:
-        logger.debug(f"Looking for files created in the last {config['lookback_time']} minutes")
+        logger.debug("Looking for files created in the last %s minutes", config['lookback_time'])
         cutoff_time = datetime.now() - timedelta(minutes=config["lookback_time"])
         cutoff_timestamp = cutoff_time.timestamp()
 
-    matching_files = []
-    for directory in config["watch_directories"]:
-        dir_path = Path(directory)
-        if not dir_path.exists():
-            logger.error(f"Watch directory does not exist: {directory}")
+    # Guards against the same file being reached twice, e.g. through overlapping or symlinked watch directories
+    seen_files = set()
+    match = compile_file_patterns(config["file_patterns"]).match
+    # A directory listed twice is walked once, so its scanned_dirs entry keeps the files it holds
+    for directory in dict.fromkeys(config["watch_directories"]):
+        if not os.path.exists(directory):
+            logger.error("Watch directory does not exist: %s", directory)
             continue
         try:
-            for pattern in config["file_patterns"]:
-                for file_path in dir_path.glob(pattern):
-                    if file_path.is_file():
-                        # Check if file was created after cutoff time, otherwise skip
-                        if (
-                            cutoff_timestamp
-                            and file_path.stat().st_ctime < cutoff_timestamp
-                        ):
-                            continue
-                        matching_files.append(file_path)
+            # Taken before the scan, so files added while scanning trigger a rescan next time
+            dir_stat = os.stat(directory)
+            if dir_mtimes is not None and dir_mtimes.get(directory) == dir_stat.st_mtime_ns:
+                logger.debug("Watch directory unchanged since last scan: %s", directory)
+                continue
+            dir_filenames = []
+
+            # Single directory pass for all patterns; DirEntry caches the type and stat results
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not match(entry.name):
+                        continue
+                    if not entry.is_file():
+                        continue
+                    # Check if file was created after cutoff time, otherwise skip
+                    stat_result = entry.stat()
+                    if cutoff_timestamp and stat_result.st_ctime < cutoff_timestamp:
+                        continue
+                    # DirEntry.stat() reports st_dev and st_ino as 0 on Windows, so the key is built from
+                    # entry.inode(), which is real on every platform, and the device of the watch directory
+                    file_key = (dir_stat.st_dev, entry.inode())
+                    if file_key in seen_files:
+                        continue
+                    seen_files.add(file_key)
+                    file_path = Path(entry.path)
+                    if file_stats is not None:
+                        file_stats[file_path] = stat_result
+                    dir_filenames.append(entry.name)
+                    yield file_path
+
+            if scanned_dirs is not None and time.time_ns() - dir_stat.st_mtime_ns >= RACY_MTIME_WINDOW_NS:
+                scanned_dirs[directory] = (dir_stat.st_mtime_ns, dir_filenames)
 
         except Exception as e:
-            logger.error(f"Error scanning directory {directory}: {e}")
-    return matching_files
+            logger.error("Error scanning directory %s: %s", directory, e)
+
+
+def mark_directories_processed(dir_mtimes: Dict[str, int], scanned_dirs: Dict[str, Tuple[int, List[str]]],
+                               recorded: Iterable[str]) -> None:
+    """
+    Remember the mtime of each scanned directory whose matching files are all recorded,
+    so that later scans can skip it until it changes. Directories with files still to be
+    recorded (not sampled, beyond a processing limit or failed) are scanned again.
+
+    Args:
+        dir_mtimes: Modification times of processed directories, updated in place
+        scanned_dirs: Directories filled in by find_recent_files
+        recorded: STF filenames known to be recorded
+    """
+    for directory, (mtime, filenames) in scanned_dirs.items():
+        if all(filename in recorded for filename in filenames):
+            dir_mtimes[directory] = mtime
 
 
 def sample_files(
@@ -93,10 +241,11 @@ def sample_files(
     if not files:
         return []
 
-    selection_count = max(1, int(len(files) * selection_fraction))
-    # Use random selection
-    selected = random.sample(files, min(selection_count, len(files)))
-    logger.debug(f"Selected {len(selected)} files out of {len(files)} candidates")
+    selection_count = min(max(1, int(len(files) * selection_fraction)), len(files))
+    # Use random selection over indices, keeping the selected files in scan order
+    indices = sorted(random.sample(range(len(files)), selection_count))
+    selected = [files[i] for i in indices]
+    logger.debug("Selected %s files out of %s candidates", len(selected), len(files))
     return selected
 
 
@@ -116,14 +265,8 @@ def extract_run_number(file_path: Path, default_run_number: int) -> int:
     filename = file_path.name
 
     # Look for run number patterns
-    patterns = [
-        r"run_(\d+)",
-        r"run(\d+)",
-        r"r(\d+)",
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, filename, re.IGNORECASE)
+    for pattern in RUN_NUMBER_PATTERNS:
+        match = pattern.search(filename)
         if match:
             return int(match.group(1))
 
@@ -132,25 +275,34 @@ def extract_run_number(file_path: Path, default_run_number: int) -> int:
 
 
 
-def calculate_checksum(file_path: str, logger: logging.Logger) -> str:
+def calculate_checksum(file_path: str, logger: logging.Logger, algorithm: str = DEFAULT_CHECKSUM_ALGORITHM) -> str:
     """
-    Calculate MD5 checksum of file.
+    Calculate checksum of file (MD5 by default).
 
     Args:
         file_path: Path to the file as string
         logger: Logger instance
+        algorithm: hashlib algorithm name, e.g. "md5", "sha256", "blake2b"
 
     Returns:
-        MD5 checksum string
+        Hex digest string
     """
-    hash_md5 = hashlib.md5()
     try:
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+            if hasattr(os, "posix_fadvise"):
+                # Whole file is read front to back, let the kernel read ahead aggressively
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            # Integrity checksum only: usedforsecurity=False keeps MD5 usable on FIPS-enabled builds
+            if hasattr(hashlib, "file_digest"):
+                # Python 3.11+: read and hash loop runs in C without the GIL
+                return hashlib.file_digest(f, lambda: hashlib.new(algorithm, usedforsecurity=False)).hexdigest()
+            hasher = hashlib.new(algorithm, usedforsecurity=False)
+            update, read = hasher.update, f.read
+            for chunk in iter(lambda: read(CHECKSUM_CHUNK_SIZE), b""):
+                update(chunk)
+        return hasher.hexdigest()
     except Exception as e:
-        logger.error(f"Error calculating checksum for {file_path}: {e}")
+        logger.error("Error calculating checksum for %s: %s", file_path, e)
         return ""
 
 
@@ -173,10 +325,10 @@ def get_or_create_run(run_number: int, agent, logger: logging.Logger) -> Dict[st
         # Handle both paginated response (dict with 'results') and direct list response
         if isinstance(runs_response, dict) and runs_response.get('results'):
             if len(runs_response['results']) > 0:
-                logger.debug(f"Found existing run: {run_number}")
+                logger.debug("Found existing run: %s", run_number)
                 return runs_response['results'][0]
         elif isinstance(runs_response, list) and len(runs_response) > 0:
-            logger.debug(f"Found existing run: {run_number}")
+            logger.debug("Found existing run: %s", run_number)
             return runs_response[0]
         
         # Create new run if not found
@@ -187,11 +339,11 @@ def get_or_create_run(run_number: int, agent, logger: logging.Logger) -> Dict[st
         }
         
         new_run = agent.call_monitor_api('post', '/runs/', run_data)
-        logger.info(f"Created new run: {run_number}")
+        logger.info("Created new run: %s", run_number)
         return new_run
         
     except Exception as e:
-        logger.error(f"Error getting or creating run {run_number}: {e}")
+        logger.error("Error getting or creating run %s: %s", run_number, e)
         raise
 
 
@@ -208,11 +360,150 @@ def construct_file_url(file_path: Path, base_url: str = "file://") -> str:
     """
     base_url = base_url.rstrip('/')
 
-    # Convert to absolute path and create URL
-    abs_path = file_path.resolve()
+    # Convert to absolute path and create URL; scanned paths are usually absolute already
+    abs_path = os.fspath(file_path)
+    if not os.path.isabs(abs_path):
+        abs_path = os.path.abspath(abs_path)
     return f"{base_url}/{abs_path}"
 
 
+def build_stf_file_data(file_path: Path, run_data: Dict[str, Any], config: dict,
+                        logger: logging.Logger, checksum: Optional[str] = None,
+                        file_stat: Optional[os.stat_result] = None) -> Dict[str, Any]:
+    """
+    Build the STF file payload for the REST API without sending it.
+
+    Args:
+        file_path: Path to the STF file
+        run_data: Run data dictionary the file belongs to
+        config: Configuration dictionary
+        logger: Logger instance
+        checksum: Precomputed checksum, calculated here if needed and not given
+        file_stat: Stat result from the directory scan, the file is stat'ed if not given
+
+    Returns:
+        STF file payload dictionary
+    """
+    file_url = construct_file_url(file_path, config.get("base_url", "file://"))
+
+    # Get file information
+    if file_stat is None:
+        file_stat = file_path.stat()
+    file_size = file_stat.st_size
+
+    # Calculate checksum (optional, can be expensive)
+    if checksum is None:
+        checksum = ""
+        if config.get("calculate_checksum", False):
+            algorithm = config.get("checksum_algorithm", DEFAULT_CHECKSUM_ALGORITHM)
+            checksum = calculate_checksum(file_path, logger, algorithm)
+
+    return {
+        "run": run_data["run_id"],
+        "stf_filename": file_path.name,
+        "file_size_bytes": file_size,
+        "checksum": checksum,
+        "status": FileStatus.REGISTERED,
+        "metadata": {
+            "original_path": str(file_path),
+            "file_url": file_url,  # Store original file_url in metadata instead
+            "creation_time": datetime.fromtimestamp(file_stat.st_ctime).isoformat(),
+            "modification_time": datetime.fromtimestamp(
+                file_stat.st_mtime
+            ).isoformat(),
+            "agent_version": "1.0.0",
+        },
+    }
+
+
+def get_recorded_stf_filenames(filenames: List[str], agent, logger: logging.Logger,
+                               batch_size: int = 100, unchecked: Optional[Set[str]] = None) -> Set[str]:
+    """
+    Find which of the given STF filenames are already recorded, using one REST query per batch.
+
+    Batches rely on swf-monitor accepting "stf_filename__in", i.e. StfFileViewSet declaring
+    filterset_fields = {'stf_filename': ['exact', 'in']}. If the monitor ignores the filter,
+    and so returns names that were not asked for, the remaining names are looked up one by
+    one with the exact "stf_filename" filter instead. The same applies to the names missing
+    from a batch whose results do not fit in one page.
+
+    Args:
+        filenames: STF filenames to look up
+        agent: BaseAgent instance for API access
+        logger: Logger instance
+        batch_size: Maximum number of filenames per query
+        unchecked: Optional set filled with the filenames that could not be checked, because
+            their query failed. They are neither known to be recorded nor safe to record.
+
+    Returns:
+        Set of filenames already known to the monitor
+    """
+    requested = set(filenames)
+    recorded = set()
+    if unchecked is None:
+        unchecked = set()
+    # The "in" filter splits its value on commas after URL decoding, so such names are looked up on their own
+    exact_lookups = sorted(name for name in requested if "," in name)
+    names = sorted(name for name in requested if "," not in name)
+    for start in range(0, len(names), batch_size):
+        batch = names[start:start + batch_size]
+        query = ",".join(quote(name) for name in batch)
+        try:
+            response = agent.call_monitor_api('get', f'/stf-files/?stf_filename__in={query}')
+        except Exception as e:
+            logger.warning("Could not check for recorded STF files: %s", e)
+            unchecked.update(batch)
+            continue
+
+        results = _api_results(response)
+        found = {r.get('stf_filename') for r in results}
+        total = response.get('count', len(results)) if isinstance(response, dict) else len(results)
+        if not found <= set(batch) or total > len(batch):
+            logger.warning("swf-monitor ignored the stf_filename__in filter, "
+                           "falling back to one lookup per STF file")
+            exact_lookups.extend(names[start:])
+            break
+        recorded.update(found)
+        if len(results) < total or (isinstance(response, dict) and response.get('next')):
+            # Filter honoured but paginated below the batch size: check the names not seen on this page
+            exact_lookups.extend(name for name in batch if name not in found)
+
+    for name in exact_lookups:
+        try:
+            response = agent.call_monitor_api('get', f'/stf-files/?stf_filename={quote(name)}')
+        except Exception as e:
+            logger.warning("Could not check whether %s is recorded: %s", name, e)
+            unchecked.add(name)
+            continue
+        if any(r.get('stf_filename') == name for r in _api_results(response)):
+            recorded.add(name)
+
+    return recorded
+
+
+def _api_results(response) -> List[Dict[str, Any]]:
+    # Handle both paginated response (dict with 'results') and direct list response
+    if isinstance(response, dict):
+        return response.get('results') or []
+    return response or []
+
+
+def remember_recorded(recorded_cache: OrderedDict[str, None], filenames: Iterable[str]) -> None:
+    """
+    Add STF filenames to a bounded cache of files known to be recorded,
+    evicting the least recently seen names beyond RECORDED_CACHE_SIZE.
+
+    Args:
+        recorded_cache: Cache to update, in least to most recently seen order
+        filenames: STF filenames known to be recorded
+    """
+    for filename in filenames:
+        recorded_cache[filename] = None
+        recorded_cache.move_to_end(filename)
+    while len(recorded_cache) > RECORDED_CACHE_SIZE:
+        recorded_cache.popitem(last=False)
+
+
 def record_stf_file(file_path: Path, config: dict, agent, logger: logging.Logger) -> Dict[str, Any]:
     """
     Record a file in the database using REST API.
@@ -226,54 +517,133 @@ def record_stf_file(file_path: Path, config: dict, agent, logger: logging.Logger
         logger: Logger instance
     
     Returns:
-        STF file data dictionary
+        STF file data dictionary, or an empty dictionary if the file is already recorded
     """
     try:
-        # Check if file already exists in database
-        file_url = construct_file_url(file_path, config.get("base_url", "file://"))
-        
-        # TODO: Check if file already recorded
-
-        # Get file information
-        file_stat = file_path.stat()
-        file_size = file_stat.st_size
+        unchecked = set()
+        if file_path.name in get_recorded_stf_filenames([file_path.name], agent, logger, unchecked=unchecked):
+            logger.debug("File already recorded: %s", file_path)
+            return {}
+        if unchecked:
+            raise RuntimeError("could not check whether the file is already recorded")
 
         # Extract run number and get/create run
         run_number = extract_run_number(file_path, config["default_run_number"])
         run_data = get_or_create_run(run_number, agent, logger)
 
-        # Calculate checksum (optional, can be expensive)
-        checksum = ""
-        if config.get("calculate_checksum", False):
-            checksum = calculate_checksum(file_path, logger)
-
         # Create STF file record via API
-        stf_file_data = {
-            "run": run_data["run_id"],
-            "stf_filename": file_path.name,
-            "file_size_bytes": file_size,
-            "checksum": checksum,
-            "status": FileStatus.REGISTERED,
-            "metadata": {
-                "original_path": str(file_path),
-                "file_url": file_url,  # Store original file_url in metadata instead
-                "creation_time": datetime.fromtimestamp(file_stat.st_ctime).isoformat(),
-                "modification_time": datetime.fromtimestamp(
-                    file_stat.st_mtime
-                ).isoformat(),
-                "agent_version": "1.0.0",
-            },
-        }
-
+        stf_file_data = build_stf_file_data(file_path, run_data, config, logger)
         stf_file = agent.call_monitor_api('POST', '/stf-files/', stf_file_data)
-        logger.info(f"Recorded file: {file_path} -> {stf_file['file_id']}")
+        logger.info("Recorded file: %s -> %s", file_path, stf_file['file_id'])
         return stf_file
 
     except Exception as e:
-        logger.error(f"Error recording file {file_path}: {e}")
+        logger.error("Error recording file %s: %s", file_path, e)
         raise
 
 
+def record_stf_files(file_paths: List[Path], config: dict, agent, logger: logging.Logger,
+                     file_stats: Optional[Dict[Path, os.stat_result]] = None,
+                     run_cache: Optional[Dict[int, Dict[str, Any]]] = None,
+                     recorded_cache: Optional[OrderedDict[str, None]] = None) -> List[Dict[str, Any]]:
+    """
+    Record a batch of STF files in the database using REST API.
+
+    Already recorded files are filtered out with a single lookup, each distinct
+    run is resolved once, and checksums are calculated in the background so
+    that hashing later files overlaps with posting earlier ones.
+    Files whose existence check fails, or that fail to build or record, are logged and skipped.
+
+    Args:
+        file_paths: Paths to the files to record
+        config: Configuration dictionary
+        agent: BaseAgent instance for API access
+        logger: Logger instance
+        file_stats: Optional stat results from find_recent_files, keyed by path
+        run_cache: Optional run data keyed by run number, reused and extended across calls
+        recorded_cache: Optional cache of filenames known to be recorded; files in it are
+            skipped without querying the monitor, and it is extended with new findings
+
+    Returns:
+        List of STF file data dictionaries for the recorded files
+    """
+    unchecked = set()
+    if recorded_cache is not None:
+        # Only ask the monitor about files not already seen as recorded by this process
+        recorded = {p.name for p in file_paths if p.name in recorded_cache}
+        remember_recorded(recorded_cache, recorded)
+        unknown = [p.name for p in file_paths if p.name not in recorded]
+        found = get_recorded_stf_filenames(unknown, agent, logger, unchecked=unchecked)
+        remember_recorded(recorded_cache, found)
+        recorded |= found
+    else:
+        recorded = get_recorded_stf_filenames([p.name for p in file_paths], agent, logger, unchecked=unchecked)
+
+    run_numbers = {}
+    for file_path in file_paths:
+        if file_path.name in recorded:
+            logger.debug("File already recorded: %s", file_path)
+            continue
+        if file_path.name in unchecked:
+            # Posting blind could duplicate an existing record, so the file waits for the next cycle
+            logger.warning("Skipping %s, could not check whether it is already recorded", file_path)
+            continue
+        run_numbers[file_path] = extract_run_number(file_path, config["default_run_number"])
+
+    # Resolve each distinct run once for the whole batch (runs are never modified once created)
+    runs = run_cache if run_cache is not None else {}
+    for run_number in set(run_numbers.values()) - runs.keys():
+        try:
+            runs[run_number] = get_or_create_run(run_number, agent, logger)
+        except Exception:
+            # Already logged by get_or_create_run; files of this run are skipped
+            continue
+
+    pending = [file_path for file_path, run_number in run_numbers.items() if run_number in runs]
+
+    # Hashing releases the GIL, so checksums are computed on worker threads
+    # while the files ahead of them in the batch are being posted
+    executor = None
+    checksums = {}
+    if config.get("calculate_checksum", False) and pending:
+        algorithm = config.get("checksum_algorithm", DEFAULT_CHECKSUM_ALGORITHM)
+        executor = ThreadPoolExecutor(max_workers=config.get("checksum_workers", DEFAULT_CHECKSUM_WORKERS))
+        checksums = {
+            file_path: executor.submit(calculate_checksum, file_path, logger, algorithm)
+            for file_path in pending
+        }
+
+    stf_files = []
+    try:
+        for file_path in pending:
+            try:
+                run_data = runs[run_numbers[file_path]]
+                checksum = checksums[file_path].result() if file_path in checksums else None
+                stf_file_data = build_stf_file_data(
+                    file_path, run_data, config, logger,
+                    checksum=checksum,
+                    file_stat=file_stats.get(file_path) if file_stats else None,
+                )
+            except Exception as e:
+                logger.error("Error preparing file %s: %s", file_path, e)
+                continue
+
+            try:
+                stf_file = agent.call_monitor_api('POST', '/stf-files/', stf_file_data)
+                logger.info("Recorded file: %s -> %s", file_path, stf_file['file_id'])
+                stf_files.append(stf_file)
+                if recorded_cache is not None:
+                    remember_recorded(recorded_cache, (file_path.name,))
+            except Exception as e:
+                logger.error("Error recording file %s: %s", file_path, e)
+    finally:
+        if executor is not None:
+            # On an early exit (e.g. KeyboardInterrupt) do not wait for queued checksums of large files
+            executor.shutdown(cancel_futures=True)
+
+    return stf_files
+
+
 def simulate_tf_subsamples(stf_file: Dict[str, Any], config: dict, logger: logging.Logger, agent_name: str) -> List[
     Dict[str, Any]]:
     """
@@ -296,12 +666,13 @@ def simulate_tf_subsamples(stf_file: Dict[str, Any], config: dict, logger: loggi
         stf_size = stf_file.get("size_bytes", 0)
         # filename without extension
         base_filename = stf_file.get("filename", "unknown").rsplit('.', 1)[0]
+        tf_prefix = f"{base_filename}_tf_"
         
         for i in range(tf_files_per_stf):
             sequence_number = tf_sequence_start + i
             
             # Generate TF filename based on STF filename
-            tf_filename = f"{base_filename}_tf_{sequence_number:03d}.tf"
+            tf_filename = f"{tf_prefix}{sequence_number:03d}.tf"
             
             # Calculate TF file size as fraction of STF size with some gaussian randomness
             tf_size = int(stf_size * tf_size_fraction * random.gauss(1.0, 0.1))
@@ -329,7 +700,7 @@ def simulate_tf_subsamples(stf_file: Dict[str, Any], config: dict, logger: loggi
         return tf_subsamples
 
     except Exception as e:
-        logger.error(f"Unexpected error simulating TF subsamples: {e}")
+        logger.error("Unexpected error simulating TF subsamples: %s", e)
         return []
 
 
@@ -359,14 +730,38 @@ def record_tf_file(tf_metadata: Dict[str, Any], config: dict, agent, logger: log
         # Create TF file record via FastMonFile API
         tf_file = agent.call_monitor_api('post', '/fastmon-files/', tf_file_data)
         tf_file_id = tf_file.get('tf_file_id') or tf_file.get('id') or 'unknown'
-        logger.debug(f"Recorded TF file: {tf_metadata['tf_filename']} -> {tf_file_id}")
+        logger.debug("Recorded TF file: %s -> %s", tf_metadata['tf_filename'], tf_file_id)
         return tf_file
 
     except Exception as e:
-        logger.error(f"Error recording TF file {tf_metadata['tf_filename']}: {e}")
+        logger.error("Error recording TF file %s: %s", tf_metadata['tf_filename'], e)
         return {}
 
 
+def record_tf_files(tf_subsamples: List[Dict[str, Any]], config: dict, agent,
+                    logger: logging.Logger) -> List[Dict[str, Any]]:
+    """
+    Record a batch of TF files, one POST per file. With "tf_record_workers" > 1 in the
+    configuration the POSTs are issued concurrently, as they only wait on the network.
+
+    Args:
+        tf_subsamples: List of TF metadata dictionaries from simulate_tf_subsamples
+        config: Configuration dictionary
+        agent: BaseAgent instance for API access
+        logger: Logger instance
+
+    Returns:
+        List of FastMonFile data dictionaries in input order (empty for failed records)
+    """
+    workers = min(config.get("tf_record_workers", DEFAULT_TF_RECORD_WORKERS), len(tf_subsamples))
+    if workers <= 1:
+        return [record_tf_file(tf_metadata, config, agent, logger) for tf_metadata in tf_subsamples]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda tf_metadata: record_tf_file(tf_metadata, config, agent, logger),
+                                 tf_subsamples))
+
+
 def create_tf_message(tf_file: Dict[str, Any], stf_file: Dict[str, Any], agent_name: str) -> Dict[str, Any]:
     """
     Create a message for TF file registration notifications.
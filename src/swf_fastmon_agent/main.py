@@ -9,8 +9,11 @@ The TFs are then broadcast via ActiveMQ to fast monitoring clients.
 Designed to run continuously under supervisord.
 """
 
+import os
 import sys
 import json
+import time
+from collections import OrderedDict
 from datetime import datetime
 
 from swf_common_lib.base_agent import BaseAgent, setup_environment
@@ -46,12 +49,17 @@ class FastMonitorAgent(BaseAgent):
 
         # Validate configuration
         fastmon_utils.validate_config(self.config)
-        self.logger.info(f"Fast Monitor Agent initialized with config: {self.config}")
+        self.logger.info("Fast Monitor Agent initialized with config: %s", self.config)
 
         # Fast monitoring specific state
         self.stf_messages_processed = 0
+        self.files_processed = 0
         self.last_message_time = None
-        self.processing_stats = {'total_stf_messages': 0, 'total_tf_files_created': 0}
+        self.run_cache = {}  # run_number -> run data from the monitor
+        self.recorded_cache = OrderedDict()  # STF filenames known to be recorded, bounded LRU
+        # Watch directory -> mtime (ns) once all its files were recorded, only used with skip_unchanged_directories
+        self.dir_mtimes = {} if self.config.get("skip_unchanged_directories", False) else None
+        self.processing_stats = {'total_stf_messages': 0, 'total_tf_files_created': 0, 'total_files': 0}
 
 
     def _emulate_stf_registration_and_sampling(self):
@@ -65,50 +73,57 @@ class FastMonitorAgent(BaseAgent):
             tf_files_registered = []
             self.logger.debug("Starting STF file registration and TF sampling process")
             # Find the most recent STF files based on the time window set in the configuration
-            recent_files = fastmon_utils.find_recent_files(self.config, self.logger)
+            file_stats = {}
+            scanned_dirs = {} if self.dir_mtimes is not None else None
+            recent_files = fastmon_utils.find_recent_files(
+                self.config, self.logger, file_stats, self.dir_mtimes, scanned_dirs
+            )
             if not recent_files:
+                if scanned_dirs:
+                    fastmon_utils.mark_directories_processed(self.dir_mtimes, scanned_dirs, self.recorded_cache)
                 self.logger.warning("No recent files found")
                 return
-            self.logger.debug(f"Found {len(recent_files)} STF files to process")
+            self.logger.debug("Found %s STF files to process", len(recent_files))
             self.processing_stats['total_files'] += len(recent_files)
 
             # Sample a fraction of the files based on the selection fraction
             if self.config['selection_fraction'] < 1.0:
-                self.logger.debug(f"Sampling {self.config['selection_fraction'] * 100}% of recent files")
+                self.logger.debug("Sampling %s%% of recent files", self.config['selection_fraction'] * 100)
                 recent_files = fastmon_utils.sample_files(recent_files, self.config['selection_fraction'], self.logger)
 
             # For TEST, kee only the first 2 files
             if len(recent_files) > 2:
-                self.logger.warning(f"TEST MODE: Limiting processing to first 2 files for testing purposes")
+                self.logger.warning("TEST MODE: Limiting processing to first 2 files for testing purposes")
                 recent_files = recent_files[:2]
 
             # Register the files in the swf monitoring database as STF files
-            for file_path in recent_files:
-                self.logger.debug(f"Processing {file_path} for registration and sampling")
-                stf_file = fastmon_utils.record_stf_file(file_path, self.config, self, self.logger)
-                self.files_processed += 1
-
-                # Simulate TF subsamples for this STF file
-                tf_subsamples = fastmon_utils.simulate_tf_subsamples(stf_file, file_path, self.config, self.logger)
-
-                # Record each TF file in the FastMonFile table
-                tf_files_created = 0
-                for tf_metadata in tf_subsamples:
-                    tf_file = fastmon_utils.record_tf_file(stf_file, tf_metadata, self.config, self, self.logger)
+            stf_files = fastmon_utils.record_stf_files(
+                recent_files, self.config, self, self.logger, file_stats, self.run_cache,
+                self.recorded_cache
+            )
+            self.files_processed += len(stf_files)
+            if scanned_dirs:
+                # Only directories whose files are all recorded can be skipped until they change
+                fastmon_utils.mark_directories_processed(self.dir_mtimes, scanned_dirs, self.recorded_cache)
+
+            for stf_file in stf_files:
+                # Map the registered STF onto the keys used by stf_ready messages
+                stf_data = {
+                    'filename': stf_file.get('stf_filename'),
+                    'size_bytes': stf_file.get('file_size_bytes', 0),
+                }
+                for tf_file in self._record_tf_subsamples(stf_data):
                     if tf_file:
-                        tf_files_created += 1
                         # Send notification to clients about new TF file
                         self.send_tf_file_notification(tf_file, stf_file)
                     tf_files_registered.append(tf_file)
 
-                self.logger.info(f"Registered {tf_files_created} TF subsamples for STF file {stf_file['filename']}")
-
             # Report successful processing
             self.report_agent_status('OK', f'Emulating {len(tf_files_registered)} fast monitoring files')
             return tf_files_registered
 
         except Exception as e:
-            self.logger.error(f"Error in process cycle: {e}")
+            self.logger.error("Error in process cycle: %s", e)
             self.report_agent_status('ERROR', f'Fast monitoring emulation error: {str(e)}')
             return None
 
@@ -128,10 +143,10 @@ class FastMonitorAgent(BaseAgent):
             # Send message via ActiveMQ (monitor will forward to SSE clients)
             self.send_message(self.destination, message)
 
-            self.logger.debug(f"Sent TF file notification via ActiveMQ: {tf_file.get('tf_filename')}")
+            self.logger.debug("Sent TF file notification via ActiveMQ: %s", tf_file.get('tf_filename'))
 
         except Exception as e:
-            self.logger.error(f"Failed to send TF file notification: {e}")
+            self.logger.error("Failed to send TF file notification: %s", e)
 
     def on_message(self, frame):
         """
@@ -149,7 +164,7 @@ class FastMonitorAgent(BaseAgent):
             if msg_type == 'stf_ready':
                 tf_files = self.sample_timeframes(message_data)
             else:
-                self.logger.warning(f"Ignoring unknown message type {msg_type}", extra={"msg_type": msg_type})
+                self.logger.warning("Ignoring unknown message type %s", msg_type, extra={"msg_type": msg_type})
 
         except Exception as e:
             self.logger.error("Error processing message", extra={"error": str(e)})
@@ -167,28 +182,36 @@ class FastMonitorAgent(BaseAgent):
         self.stf_messages_processed += 1
         self.processing_stats['total_stf_messages'] += 1
 
-        tf_files_registered = []
-        self.logger.debug(f"Message data received: {message_data}")
+        self.logger.debug("Message data received: %s", message_data)
         if not message_data.get('filename'):
             self.logger.error("No filename provided in message")
-            return tf_files_registered
+            return []
+
+        return self._record_tf_subsamples(message_data)
+
+    def _record_tf_subsamples(self, stf_data: dict) -> list:
+        """
+        Simulate the TF subsamples of an STF and record them in the FastMonFile table.
+        Shared by the message-driven and the continuous (emulation) modes.
+
+        Args:
+            stf_data: STF data dictionary (follows the keys from daq agent)
 
-        tf_subsamples = fastmon_utils.simulate_tf_subsamples(message_data, self.config, self.logger, self.agent_name)
+        Returns:
+            List of recorded TF file dictionaries (empty for failed records)
+        """
+        tf_subsamples = fastmon_utils.simulate_tf_subsamples(stf_data, self.config, self.logger, self.agent_name)
 
         # Record each TF file in the FastMonFile table
         # TODO: register in bulk
-        tf_files_created = 0
-        for tf_metadata in tf_subsamples:
-            self.logger.debug(f"Processing {tf_metadata}")
-            tf_file = fastmon_utils.record_tf_file(tf_metadata, self.config, self, self.logger)
-            if tf_file:
-                tf_files_created += 1
-            tf_files_registered.append(tf_file)
+        self.logger.debug("Processing %s", tf_subsamples)
+        tf_files_registered = fastmon_utils.record_tf_files(tf_subsamples, self.config, self, self.logger)
+        tf_files_created = sum(1 for tf_file in tf_files_registered if tf_file)
 
         # Update TF creation stats
         self.processing_stats['total_tf_files_created'] += tf_files_created
 
-        self.logger.info(f"Registered {tf_files_created} TF subsamples for STF file {message_data.get('filename')}")
+        self.logger.info("Registered %s TF subsamples for STF file %s", tf_files_created, stf_data.get('filename'))
         return tf_files_registered
 
     def start_continuous_monitoring(self):
@@ -199,15 +222,23 @@ class FastMonitorAgent(BaseAgent):
         self.logger.info("Starting continuous fast monitoring (DEV MODE)...")
         
         try:
-            while True:
+            # Schedule cycles on a monotonic deadline so the cadence does not drift by the cycle duration
+            deadline = time.monotonic()
+            while self.running:
                 tf_files_created = self._emulate_stf_registration_and_sampling()
                 self.send_heartbeat()
-                # Sleep for the configured interval
-                time.sleep(self.config["check_interval"])
+                # Sleep until the next cycle is due
+                deadline += self.config["check_interval"]
+                delay = deadline - time.monotonic()
+                if delay < 0:
+                    self.logger.warning("Scan cycle overran the check interval by %.2fs", -delay)
+                    deadline = time.monotonic()
+                else:
+                    time.sleep(delay)
         except KeyboardInterrupt:
             self.logger.info("Received interrupt signal")
         except Exception as e:
-            self.logger.error(f"Unexpected error in monitoring loop: {e}")
+            self.logger.error("Unexpected error in monitoring loop: %s", e)
             self.report_agent_status('ERROR', f'Monitoring loop error: {str(e)}')
         finally:
             self.logger.info("Fast Monitor Agent stopped")
@@ -233,10 +264,14 @@ def main():
         "default_run_number": 1,
         "base_url": "file://",
         "calculate_checksum": True,
+        "checksum_workers": 4,  # Threads used to checksum a batch of STF files
+        "checksum_algorithm": "md5",  # Any hashlib algorithm, e.g. "sha256" or "blake2b"
+        "skip_unchanged_directories": False,  # Skip watch directories whose mtime did not change since the last scan
         # TF simulation parameters
         "tf_files_per_stf": 7,  # Number of TF files to generate per STF
         "tf_size_fraction": 0.15,  # Fraction of STF size for each TF
         "tf_sequence_start": 1,  # Starting sequence number for TF files
+        "tf_record_workers": 1,  # Concurrent TF record POSTs per STF (1 = sequential)
     }
 
     # Create agent with config and debug flag
@@ -6,6 +6,7 @@ Unit tests for fastmon_utils.py utilities and REST helpers.
 import pytest
 import logging
 from unittest.mock import Mock, MagicMock, patch
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime
 import tempfile
@@ -14,6 +15,10 @@ import os
 from swf_fastmon_agent.fastmon_utils import (
     get_or_create_run,
     record_stf_file,
+    record_stf_files,
+    get_recorded_stf_filenames,
+    record_tf_files,
+    remember_recorded,
     simulate_tf_subsamples,
     record_tf_file,
     find_recent_files,
@@ -21,6 +26,10 @@ from swf_fastmon_agent.fastmon_utils import (
     extract_run_number,
     calculate_checksum,
     construct_file_url,
+    compile_file_patterns,
+    iter_recent_files,
+    mark_directories_processed,
+    validate_config,
     FileStatus,
 )
 
@@ -99,10 +108,11 @@ class TestRecordStfFile:
             mock_agent = Mock()
             mock_logger = Mock()
 
-            # Mock POST response from API
-            mock_agent.call_monitor_api.return_value = {
-                'file_id': 'uuid-123', 'stf_filename': temp_file_path.name
-            }
+            # Mock existence lookup and POST responses from API
+            mock_agent.call_monitor_api.side_effect = [
+                {'count': 0, 'results': []},
+                {'file_id': 'uuid-123', 'stf_filename': temp_file_path.name},
+            ]
 
             config = {
                 'base_url': 'file://',
@@ -117,8 +127,11 @@ class TestRecordStfFile:
 
             assert result['file_id'] == 'uuid-123'
 
-            # Verify a single POST call with expected keys
-            mock_agent.call_monitor_api.assert_called_once()
+            # Verify the existence lookup, then a single POST call with expected keys
+            assert mock_agent.call_monitor_api.call_count == 2
+            method, path = mock_agent.call_monitor_api.call_args_list[0][0]
+            assert method == 'get'
+            assert path == f'/stf-files/?stf_filename__in={temp_file_path.name}'
             method, path, payload = mock_agent.call_monitor_api.call_args[0]
             assert method == 'POST'
             assert path == '/stf-files/'
@@ -133,6 +146,21 @@ class TestRecordStfFile:
             if temp_file_path.exists():
                 temp_file_path.unlink()
 
+    def test_record_existing_file_is_skipped(self, tmp_path):
+        """Files already known to the monitor are not posted again."""
+        stf = tmp_path / 'run_1_stf.stf'
+        stf.write_bytes(b'data')
+        mock_agent = Mock()
+        mock_agent.call_monitor_api.return_value = {'count': 1, 'results': [{'stf_filename': stf.name}]}
+        config = {'base_url': 'file://', 'default_run_number': 1}
+
+        with patch('swf_fastmon_agent.fastmon_utils.get_or_create_run') as mock_get_run:
+            result = record_stf_file(stf, config, mock_agent, Mock())
+
+        assert result == {}
+        mock_agent.call_monitor_api.assert_called_once()
+        mock_get_run.assert_not_called()
+
     def test_record_new_file_checksum(self):
         """When checksum is enabled, include MD5 in payload."""
         content = b'checksum test data\n'
@@ -143,9 +171,10 @@ class TestRecordStfFile:
         try:
             mock_agent = Mock()
             mock_logger = Mock()
-            mock_agent.call_monitor_api.return_value = {
-                'file_id': 'uuid-ck', 'stf_filename': temp_file_path.name
-            }
+            mock_agent.call_monitor_api.side_effect = [
+                {'count': 0, 'results': []},
+                {'file_id': 'uuid-ck', 'stf_filename': temp_file_path.name},
+            ]
 
             config = {
                 'base_url': 'file://',
@@ -167,6 +196,289 @@ class TestRecordStfFile:
                 temp_file_path.unlink()
 
 
+class TestRecordStfFiles:
+    """Tests for record_stf_files batch helper."""
+
+    def test_record_batch_skips_failed_posts(self, tmp_path):
+        """Every file is posted; a failing POST does not abort the batch."""
+        files = []
+        for i in range(3):
+            p = tmp_path / f'run_7_stf_{i}.stf'
+            p.write_bytes(b'data')
+            files.append(p)
+
+        mock_agent = Mock()
+        mock_logger = Mock()
+        mock_agent.call_monitor_api.side_effect = [
+            {'results': []},  # None of the files recorded yet
+            {'file_id': 'uuid-0'},
+            Exception("API Error"),
+            {'file_id': 'uuid-2'},
+        ]
+
+        config = {'base_url': 'file://', 'default_run_number': 1}
+
+        with patch('swf_fastmon_agent.fastmon_utils.get_or_create_run') as mock_get_run:
+            mock_get_run.return_value = {'run_id': 7, 'run_number': 7}
+            result = record_stf_files(files, config, mock_agent, mock_logger)
+
+        assert [r['file_id'] for r in result] == ['uuid-0', 'uuid-2']
+        # All files share run 7, so the run is resolved only once
+        mock_get_run.assert_called_once_with(7, mock_agent, mock_logger)
+        assert mock_agent.call_monitor_api.call_count == 4
+        posted = [c[0][2]['stf_filename'] for c in mock_agent.call_monitor_api.call_args_list[1:]]
+        assert posted == [f.name for f in files]
+        mock_logger.error.assert_called_once()
+
+    def test_record_batch_skips_recorded_files(self, tmp_path):
+        """Files reported by the existence lookup are not posted again."""
+        old = tmp_path / 'run_7_old.stf'
+        new = tmp_path / 'run_7_new.stf'
+        old.write_bytes(b'data')
+        new.write_bytes(b'data')
+
+        mock_agent = Mock()
+        mock_logger = Mock()
+        mock_agent.call_monitor_api.side_effect = [
+            [{'stf_filename': old.name}],
+            {'file_id': 'uuid-new'},
+        ]
+
+        config = {'base_url': 'file://', 'default_run_number': 1}
+
+        with patch('swf_fastmon_agent.fastmon_utils.get_or_create_run') as mock_get_run:
+            mock_get_run.return_value = {'run_id': 7, 'run_number': 7}
+            result = record_stf_files([old, new], config, mock_agent, mock_logger)
+
+        assert [r['file_id'] for r in result] == ['uuid-new']
+        method, path = mock_agent.call_monitor_api.call_args_list[0][0]
+        assert method == 'get' and path.startswith('/stf-files/?stf_filename__in=')
+        _, _, payload = mock_agent.call_monitor_api.call_args[0]
+        assert payload['stf_filename'] == new.name
+
+    def test_record_batch_skips_unchecked_files(self, tmp_path):
+        """Files whose existence check failed are left for the next cycle, not posted."""
+        stf = tmp_path / 'run_7_stf.stf'
+        stf.write_bytes(b'data')
+        mock_agent = Mock()
+        mock_agent.call_monitor_api.side_effect = Exception('timeout')
+        config = {'base_url': 'file://', 'default_run_number': 1}
+
+        with patch('swf_fastmon_agent.fastmon_utils.get_or_create_run') as mock_get_run:
+            result = record_stf_files([stf], config, mock_agent, Mock())
+
+        assert result == []
+        mock_agent.call_monitor_api.assert_called_once()
+        mock_get_run.assert_not_called()
+
+    def test_record_batch_with_checksums(self, tmp_path):
+        """Checksums computed for the batch end up in the matching payloads."""
+        import hashlib as _hashlib
+
+        files = []
+        for i in range(4):
+            p = tmp_path / f'run_3_stf_{i}.stf'
+            p.write_bytes(f'payload {i}'.encode())
+            files.append(p)
+
+        mock_agent = Mock()
+        mock_agent.call_monitor_api.side_effect = [{'results': []}] + [
+            {'file_id': f'uuid-{i}'} for i in range(4)
+        ]
+
+        config = {
+            'base_url': 'file://',
+            'default_run_number': 1,
+            'calculate_checksum': True,
+            'checksum_workers': 2,
+        }
+
+        with patch('swf_fastmon_agent.fastmon_utils.get_or_create_run') as mock_get_run:
+            mock_get_run.return_value = {'run_id': 3, 'run_number': 3}
+            result = record_stf_files(files, config, mock_agent, logging.getLogger(__name__))
+
+        assert len(result) == 4
+        for call in mock_agent.call_monitor_api.call_args_list[1:]:
+            payload = call[0][2]
+            content = (tmp_path / payload['stf_filename']).read_bytes()
+            assert payload['checksum'] == _hashlib.md5(content).hexdigest()
+
+    def test_record_batch_cancels_checksums_on_interrupt(self, tmp_path):
+        """Queued checksums are cancelled when the batch is interrupted."""
+        import time as _time
+
+        files = []
+        for i in range(4):
+            p = tmp_path / f'run_3_stf_{i}.stf'
+            p.write_bytes(b'data')
+            files.append(p)
+
+        mock_agent = Mock()
+        mock_agent.call_monitor_api.side_effect = [{'results': []}, KeyboardInterrupt]
+        config = {'base_url': 'file://', 'default_run_number': 1,
+                  'calculate_checksum': True, 'checksum_workers': 1}
+        hashed = []
+
+        def slow_checksum(file_path, logger, algorithm):
+            _time.sleep(0.05)
+            hashed.append(file_path)
+            return 'abc'
+
+        with patch('swf_fastmon_agent.fastmon_utils.get_or_create_run') as mock_get_run, \
+                patch('swf_fastmon_agent.fastmon_utils.calculate_checksum', side_effect=slow_checksum):
+            mock_get_run.return_value = {'run_id': 3, 'run_number': 3}
+            with pytest.raises(KeyboardInterrupt):
+                record_stf_files(files, config, mock_agent, Mock())
+
+        assert len(hashed) < len(files)
+
+    def test_record_batch_reuses_scan_stats(self, tmp_path):
+        """Stat results collected during the scan are used for the payload."""
+        f = tmp_path / 'run_3_stf.stf'
+        f.write_bytes(b'data')
+        scanned = os.stat_result((0o100644, 0, 0, 1, 0, 0, 12345, 0, 0, 0))
+
+        mock_agent = Mock()
+        mock_agent.call_monitor_api.side_effect = [{'results': []}, {'file_id': 'uuid-0'}]
+        config = {'base_url': 'file://', 'default_run_number': 1}
+
+        with patch('swf_fastmon_agent.fastmon_utils.get_or_create_run') as mock_get_run:
+            mock_get_run.return_value = {'run_id': 3, 'run_number': 3}
+            record_stf_files([f], config, mock_agent, Mock(), file_stats={f: scanned})
+
+        _, _, payload = mock_agent.call_monitor_api.call_args[0]
+        assert payload['file_size_bytes'] == 12345
+
+    def test_record_batch_uses_run_cache(self, tmp_path):
+        """Runs in the cache are not looked up again; new runs are added to it."""
+        cached = tmp_path / 'run_3_stf.stf'
+        fresh = tmp_path / 'run_4_stf.stf'
+        cached.write_bytes(b'data')
+        fresh.write_bytes(b'data')
+
+        mock_agent = Mock()
+        mock_agent.call_monitor_api.side_effect = [
+            {'results': []}, {'file_id': 'uuid-3'}, {'file_id': 'uuid-4'}
+        ]
+        config = {'base_url': 'file://', 'default_run_number': 1}
+        run_cache = {3: {'run_id': 30, 'run_number': 3}}
+
+        with patch('swf_fastmon_agent.fastmon_utils.get_or_create_run') as mock_get_run:
+            mock_get_run.return_value = {'run_id': 40, 'run_number': 4}
+            record_stf_files([cached, fresh], config, mock_agent, Mock(), run_cache=run_cache)
+
+        mock_get_run.assert_called_once()
+        assert mock_get_run.call_args[0][0] == 4
+        assert run_cache[4]['run_id'] == 40
+        runs_posted = {c[0][2]['stf_filename']: c[0][2]['run'] for c in mock_agent.call_monitor_api.call_args_list[1:]}
+        assert runs_posted == {cached.name: 30, fresh.name: 40}
+
+    def test_record_batch_uses_recorded_cache(self, tmp_path):
+        """Files known to be recorded are not queried again; new findings are cached."""
+        seen = tmp_path / 'run_3_seen.stf'
+        remote = tmp_path / 'run_3_remote.stf'
+        fresh = tmp_path / 'run_3_fresh.stf'
+        for p in (seen, remote, fresh):
+            p.write_bytes(b'data')
+
+        mock_agent = Mock()
+        mock_agent.call_monitor_api.side_effect = [
+            {'results': [{'stf_filename': remote.name}]}, {'file_id': 'uuid-fresh'}
+        ]
+        config = {'base_url': 'file://', 'default_run_number': 1}
+        recorded_cache = OrderedDict.fromkeys([seen.name])
+
+        with patch('swf_fastmon_agent.fastmon_utils.get_or_create_run') as mock_get_run:
+            mock_get_run.return_value = {'run_id': 30, 'run_number': 3}
+            result = record_stf_files([seen, remote, fresh], config, mock_agent, Mock(),
+                                      recorded_cache=recorded_cache)
+
+        assert [r['file_id'] for r in result] == ['uuid-fresh']
+        lookup_path = mock_agent.call_monitor_api.call_args_list[0][0][1]
+        assert seen.name not in lookup_path
+        assert set(recorded_cache) == {seen.name, remote.name, fresh.name}
+
+    def test_remember_recorded_is_bounded(self, monkeypatch):
+        import swf_fastmon_agent.fastmon_utils as fastmon_utils
+
+        monkeypatch.setattr(fastmon_utils, 'RECORDED_CACHE_SIZE', 2)
+        recorded_cache = OrderedDict()
+        remember_recorded(recorded_cache, ['a.stf', 'b.stf'])
+        # Seeing a name again makes it the most recent one
+        remember_recorded(recorded_cache, ['a.stf', 'c.stf'])
+        assert list(recorded_cache) == ['a.stf', 'c.stf']
+
+
+class TestGetRecordedStfFilenames:
+    """Tests for get_recorded_stf_filenames helper."""
+
+    def test_batch_lookup(self):
+        mock_agent = Mock()
+        mock_agent.call_monitor_api.return_value = {'count': 1, 'results': [{'stf_filename': 'a.stf'}]}
+
+        recorded = get_recorded_stf_filenames(['a.stf', 'b.stf'], mock_agent, Mock())
+
+        assert recorded == {'a.stf'}
+        mock_agent.call_monitor_api.assert_called_once_with('get', '/stf-files/?stf_filename__in=a.stf,b.stf')
+
+    def test_ignored_filter_falls_back_to_exact_lookups(self):
+        """An unfiltered listing is detected and each name is then looked up exactly."""
+        mock_agent = Mock()
+        mock_agent.call_monitor_api.side_effect = [
+            {'count': 500, 'results': [{'stf_filename': 'other.stf'}]},
+            {'count': 1, 'results': [{'stf_filename': 'a.stf'}]},
+            {'count': 0, 'results': []},
+        ]
+        mock_logger = Mock()
+
+        recorded = get_recorded_stf_filenames(['a.stf', 'b.stf'], mock_agent, mock_logger)
+
+        assert recorded == {'a.stf'}
+        paths = [c[0][1] for c in mock_agent.call_monitor_api.call_args_list]
+        assert paths[1:] == ['/stf-files/?stf_filename=a.stf', '/stf-files/?stf_filename=b.stf']
+        mock_logger.warning.assert_called_once()
+
+    def test_incomplete_page_falls_back_to_exact_lookups(self):
+        """Names beyond the first page of a filtered batch are looked up exactly."""
+        names = [f'stf_{i:03d}.stf' for i in range(4)]
+        mock_agent = Mock()
+        mock_agent.call_monitor_api.side_effect = [
+            {'count': 4, 'next': '/stf-files/?page=2',
+             'results': [{'stf_filename': name} for name in names[:2]]},
+            {'count': 1, 'results': [{'stf_filename': names[2]}]},
+            {'count': 1, 'results': [{'stf_filename': names[3]}]},
+        ]
+
+        recorded = get_recorded_stf_filenames(names, mock_agent, Mock())
+
+        assert recorded == set(names)
+        paths = [c[0][1] for c in mock_agent.call_monitor_api.call_args_list]
+        assert paths[1:] == [f'/stf-files/?stf_filename={name}' for name in names[2:]]
+
+    def test_failed_queries_are_reported_unchecked(self):
+        mock_agent = Mock()
+        mock_agent.call_monitor_api.side_effect = [Exception('timeout'), Exception('timeout')]
+        unchecked = set()
+
+        recorded = get_recorded_stf_filenames(['a.stf', 'b,c.stf'], mock_agent, Mock(), unchecked=unchecked)
+
+        assert recorded == set()
+        assert unchecked == {'a.stf', 'b,c.stf'}
+
+    def test_names_with_commas_use_exact_lookup(self):
+        mock_agent = Mock()
+        mock_agent.call_monitor_api.side_effect = [
+            {'count': 0, 'results': []},
+            [{'stf_filename': 'a,b.stf'}],
+        ]
+
+        recorded = get_recorded_stf_filenames(['a,b.stf', 'c.stf'], mock_agent, Mock())
+
+        assert recorded == {'a,b.stf'}
+        paths = [c[0][1] for c in mock_agent.call_monitor_api.call_args_list]
+        assert paths == ['/stf-files/?stf_filename__in=c.stf', '/stf-files/?stf_filename=a%2Cb.stf']
+
+
 class TestSimulateTfSubsamples:
     """Tests for simulate_tf_subsamples function."""
 
@@ -285,6 +597,14 @@ class TestRecordTfFile:
 class TestMiscUtilities:
     """Tests for standalone utility helpers."""
 
+    def test_file_status_matches_monitor_choices(self):
+        # Lower-case values must match the swf-monitor FileStatus choices
+        assert FileStatus.REGISTERED == 'registered'
+        assert FileStatus.PROCESSING == 'processing'
+        assert FileStatus.PROCESSED == 'processed'
+        assert FileStatus.FAILED == 'failed'
+        assert FileStatus.DONE == 'done'
+
     def test_extract_run_number_patterns(self):
         assert extract_run_number(Path('run_12345_stf_001.stf'), 1) == 12345
         assert extract_run_number(Path('run9999.stf'), 1) == 9999
@@ -297,6 +617,11 @@ class TestMiscUtilities:
         url = construct_file_url(f, 'file://')
         assert url.startswith('file://') and f.name in url
 
+    def test_construct_file_url_relative_path(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        url = construct_file_url(Path('a.stf'), 'file://')
+        assert url == construct_file_url(tmp_path / 'a.stf', 'file://')
+
     def test_calculate_checksum(self, tmp_path):
         f = tmp_path / 'data.stf'
         content = b'abcdefg'
@@ -306,6 +631,43 @@ class TestMiscUtilities:
 
         assert cs == _hashlib.md5(content).hexdigest()
 
+    def test_calculate_checksum_algorithm(self, tmp_path):
+        import hashlib as _hashlib
+
+        f = tmp_path / 'data.stf'
+        content = b'abcdefg'
+        f.write_bytes(content)
+        cs = calculate_checksum(f, logging.getLogger(__name__), 'sha256')
+        assert cs == _hashlib.sha256(content).hexdigest()
+
+    def test_validate_config_checksum_algorithm(self):
+        validate_config({'selection_fraction': 0.5, 'checksum_algorithm': 'sha256'})
+        with pytest.raises(ValueError):
+            validate_config({'selection_fraction': 0.5, 'checksum_algorithm': 'crc-none'})
+        with pytest.raises(ValueError):
+            validate_config({'selection_fraction': 0.5, 'checksum_algorithm': 'shake_128'})
+
+    @pytest.mark.parametrize('key', ['checksum_workers', 'tf_record_workers'])
+    def test_validate_config_worker_counts(self, key):
+        validate_config({'selection_fraction': 0.5, key: 4})
+        for workers in (0, -1, 2.5, True):
+            with pytest.raises(ValueError):
+                validate_config({'selection_fraction': 0.5, key: workers})
+
+    def test_calculate_checksum_chunked_fallback(self, tmp_path, monkeypatch):
+        import hashlib as _hashlib
+        import swf_fastmon_agent.fastmon_utils as fastmon_utils
+
+        f = tmp_path / 'data.stf'
+        content = b'0123456789' * 100
+        f.write_bytes(content)
+        # Force the pre-3.11 code path with a chunk smaller than the file
+        monkeypatch.delattr(_hashlib, 'file_digest', raising=False)
+        monkeypatch.setattr(fastmon_utils, 'CHECKSUM_CHUNK_SIZE', 64)
+
+        cs = calculate_checksum(f, logging.getLogger(__name__))
+        assert cs == _hashlib.md5(content).hexdigest()
+
     def test_find_recent_files_and_sample(self, tmp_path):
         # Create files
         files = []
@@ -329,3 +691,152 @@ class TestMiscUtilities:
         # Sample ~40% => 2 files (min 1)
         sampled = sample_files(found, config['selection_fraction'], logging.getLogger(__name__))
         assert len(sampled) == 2
+
+    def test_sample_files_keeps_scan_order(self):
+        files = [Path(f'f{i}.stf') for i in range(50)]
+        sampled = sample_files(files, 0.2, logging.getLogger(__name__))
+        assert len(sampled) == 10
+        assert len(set(sampled)) == 10
+        assert sampled == sorted(sampled, key=files.index)
+        assert sample_files([], 0.5, logging.getLogger(__name__)) == []
+
+    def test_find_recent_files_multiple_patterns(self, tmp_path):
+        lower = tmp_path / 'a.stf'
+        upper = tmp_path / 'b.STF'
+        other = tmp_path / 'c.txt'
+        for p in (lower, upper, other):
+            p.write_text('data')
+        # Directories matching a pattern are not returned
+        (tmp_path / 'd.stf').mkdir()
+
+        config = {
+            # Listing the same directory twice must not duplicate results
+            'watch_directories': [str(tmp_path), str(tmp_path / 'missing'), str(tmp_path)],
+            'file_patterns': ['*.stf', '*.STF'],
+            'lookback_time': 0,
+        }
+
+        file_stats = {}
+        found = find_recent_files(config, logging.getLogger(__name__), file_stats)
+        assert sorted(found) == sorted([lower, upper])
+        assert set(file_stats) == set(found)
+        assert file_stats[lower].st_size == lower.stat().st_size
+
+    def test_find_recent_files_without_stat_inodes(self, tmp_path):
+        """DirEntry.stat() has no st_dev/st_ino on Windows; files must still be told apart."""
+        for name in ('a.stf', 'b.stf'):
+            (tmp_path / name).write_text('data')
+        real_scandir = os.scandir
+
+        class WindowsLikeEntry:
+            def __init__(self, entry):
+                self._entry = entry
+                self.name, self.path = entry.name, entry.path
+                self.is_file, self.inode = entry.is_file, entry.inode
+
+            def stat(self):
+                st = self._entry.stat()
+                return os.stat_result((st.st_mode, 0, 0, 0) + tuple(st)[4:])
+
+        class WindowsLikeScandir:
+            def __init__(self, path):
+                self._it = real_scandir(path)
+
+            def __enter__(self):
+                return (WindowsLikeEntry(e) for e in self._it)
+
+            def __exit__(self, *exc):
+                self._it.close()
+
+        config = {'watch_directories': [str(tmp_path)], 'file_patterns': ['*.stf'], 'lookback_time': 0}
+        with patch('swf_fastmon_agent.fastmon_utils.os.scandir', WindowsLikeScandir):
+            found = find_recent_files(config, logging.getLogger(__name__))
+        assert sorted(p.name for p in found) == ['a.stf', 'b.stf']
+
+    def test_iter_recent_files_is_lazy(self, tmp_path):
+        for i in range(3):
+            (tmp_path / f'{i}.stf').write_text('data')
+        config = {
+            'watch_directories': [str(tmp_path)],
+            'file_patterns': ['*.stf'],
+            'lookback_time': 0,
+        }
+
+        files = iter_recent_files(config, logging.getLogger(__name__))
+        first = next(files)
+        assert first.parent == tmp_path
+        assert len(list(files)) == 2
+
+    def test_find_recent_files_skips_unchanged_directories(self, tmp_path):
+        first = tmp_path / 'a.stf'
+        first.write_text('data')
+        config = {
+            'watch_directories': [str(tmp_path)],
+            'file_patterns': ['*.stf'],
+            'lookback_time': 0,
+        }
+        logger = logging.getLogger(__name__)
+        dir_mtimes = {}
+
+        # A directory modified within the racy window is not reported, so it is never skipped
+        scanned_dirs = {}
+        assert find_recent_files(config, logger, dir_mtimes=dir_mtimes, scanned_dirs=scanned_dirs) == [first]
+        assert scanned_dirs == {}
+
+        old_mtime = tmp_path.stat().st_mtime_ns - 10_000_000_000
+        os.utime(tmp_path, ns=(old_mtime, old_mtime))
+        scanned_dirs = {}
+        assert find_recent_files(config, logger, dir_mtimes=dir_mtimes, scanned_dirs=scanned_dirs) == [first]
+        assert scanned_dirs == {str(tmp_path): (old_mtime, ['a.stf'])}
+
+        # Not skipped until all its files are recorded
+        mark_directories_processed(dir_mtimes, scanned_dirs, set())
+        assert dir_mtimes == {}
+        mark_directories_processed(dir_mtimes, scanned_dirs, {'a.stf'})
+        assert dir_mtimes == {str(tmp_path): old_mtime}
+        assert find_recent_files(config, logger, dir_mtimes=dir_mtimes) == []
+
+        second = tmp_path / 'b.stf'
+        second.write_text('data')
+        assert sorted(find_recent_files(config, logger, dir_mtimes=dir_mtimes)) == [first, second]
+
+        # Listing the directory twice must not hide its unrecorded files
+        config['watch_directories'] = [str(tmp_path), str(tmp_path)]
+        os.utime(tmp_path, ns=(old_mtime, old_mtime))
+        dir_mtimes = {}
+        scanned_dirs = {}
+        find_recent_files(config, logger, dir_mtimes=dir_mtimes, scanned_dirs=scanned_dirs)
+        mark_directories_processed(dir_mtimes, scanned_dirs, set())
+        assert dir_mtimes == {}
+        assert sorted(find_recent_files(config, logger, dir_mtimes=dir_mtimes)) == [first, second]
+
+    def test_compile_file_patterns(self):
+        pattern = compile_file_patterns(['*.stf', 'run_??.dat'])
+        assert pattern.match('a.stf')
+        assert pattern.match('run_01.dat')
+        assert not pattern.match('a.stf.tmp')
+        assert not pattern.match('run_001.dat')
+        assert compile_file_patterns(['*.stf', 'run_??.dat']) is pattern
+
+    def test_compile_file_patterns_case_variants(self):
+        pattern = compile_file_patterns(['*.stf', '*.STF'])
+        # Case variants collapse into a single alternative
+        assert pattern.pattern.count('|') == 0
+        assert pattern.match('a.stf') and pattern.match('b.STF') and pattern.match('c.Stf')
+
+    def test_record_tf_files_keeps_order(self):
+        tf_subsamples = [
+            {'tf_filename': f'stf_tf_{i:03d}.tf', 'file_size_bytes': 10, 'stf_parent': 'stf.stf'}
+            for i in range(5)
+        ]
+        agent = Mock()
+        agent.call_monitor_api.side_effect = lambda method, path, data: (
+            {} if data['tf_filename'] == 'stf_tf_002.tf' else {'tf_file_id': data['tf_filename']}
+        )
+
+        for workers in (1, 3):
+            config = {'tf_record_workers': workers}
+            tf_files = record_tf_files(tf_subsamples, config, agent, logging.getLogger(__name__))
+            assert [tf.get('tf_file_id') for tf in tf_files] == [
+                'stf_tf_000.tf', 'stf_tf_001.tf', None, 'stf_tf_003.tf', 'stf_tf_004.tf'
+            ]